@@ -1,13 +1,43 @@
 # Browser session management for Zendriver MCP server.
 # Includes CDP event listeners for network and console logging.
 
+import asyncio
+import itertools
+import re
+import time
 import zendriver as zd
 from zendriver import cdp
-from typing import Dict, List, Any, Optional
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
 from datetime import datetime
 
 from src.errors import BrowserNotStartedError, PageNotLoadedError
 
+# ring buffer capacities for captured logs
+MAX_NETWORK_LOGS = 1000
+MAX_CONSOLE_LOGS = 500
+
+# captured events are staged and moved into the ring buffers in bulk
+LOG_FLUSH_INTERVAL = 0.25
+MAX_STAGED_LOGS = 256
+
+# repeated network events for the same (url, method) within this window are dropped,
+# except for the types in NO_DEDUP_TYPES and failed requests, which are always logged
+NETWORK_RATE_LIMIT_NS = 1_000_000_000
+
+# identical (method, url) requests sent within this window share one log entry
+REQUEST_DEDUP_TTL_NS = 2_000_000_000
+MAX_RECENT_REQUESTS = 512
+
+# responses for these resource types legitimately differ, so they are never deduplicated
+NO_DEDUP_TYPES = (
+    cdp.network.ResourceType.XHR,
+    cdp.network.ResourceType.FETCH,
+    cdp.network.ResourceType.DOCUMENT,
+)
+# the same types as they appear in log entries
+NO_DEDUP_TYPE_VALUES = frozenset(t.value for t in NO_DEDUP_TYPES)
+
 
 class BrowserSession:
     """Singleton class to manage browser session across all tool calls."""
@@ -15,21 +45,39 @@ class BrowserSession:
     _instance: "BrowserSession | None" = None
     _browser: zd.Browser | None = None
     _page: zd.Tab | None = None
-    _tabs: Dict[str, zd.Tab] = {}
+    _tabs: Dict[int, zd.Tab] = {}  # Keyed by tab number, "tab_<n>" only at the API boundary
     _tab_counter: int = 0
-    _network_logs: List[Dict[str, Any]] = []
-    _console_logs: List[Dict[str, Any]] = []
+    _network_logs: Deque[Dict[str, Any]] = deque(maxlen=MAX_NETWORK_LOGS)
+    # Columns kept in step with _network_logs so URL/method matching skips the dicts
+    _network_urls_lower: Deque[str] = deque(maxlen=MAX_NETWORK_LOGS)
+    _network_methods: Deque[str] = deque(maxlen=MAX_NETWORK_LOGS)
+    _console_logs: Deque[Dict[str, Any]] = deque(maxlen=MAX_CONSOLE_LOGS)
     _pending_requests: Dict[str, Dict[str, Any]] = {}
-    _cdp_enabled_tabs: Dict[int, bool] = {}  # Track tabs with CDP listeners
+    _recent_requests: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+    _log_stage: List[Tuple[str, Dict[str, Any]]] = []
+    _last_emit_ns: Dict[Tuple[str, str], int] = {}
+    _flush_task: "asyncio.Task[None] | None" = None
+    _running_handlers: "Set[asyncio.Task[Any]]" = set()
+    _cdp_enabled_tabs: Set[int] = set()  # Track tabs with CDP listeners
+    _network_total: int = 0  # Entries ever appended to _network_logs, used as a read cursor
+    _network_seq: int = 0  # Bumped on every network event, lets waiters detect activity
+    _network_event: asyncio.Event = asyncio.Event()  # Replaced after each set, see _notify_network
 
     def __new__(cls) -> "BrowserSession":
         if cls._instance is None:
             cls._instance = super().__new__(cls)
             cls._tabs = {}
-            cls._network_logs = []
-            cls._console_logs = []
+            cls._network_logs = deque(maxlen=MAX_NETWORK_LOGS)
+            cls._network_urls_lower = deque(maxlen=MAX_NETWORK_LOGS)
+            cls._network_methods = deque(maxlen=MAX_NETWORK_LOGS)
+            cls._console_logs = deque(maxlen=MAX_CONSOLE_LOGS)
             cls._pending_requests = {}
-            cls._cdp_enabled_tabs = {}
+            cls._recent_requests = OrderedDict()
+            cls._log_stage = []
+            cls._last_emit_ns = {}
+            cls._running_handlers = set()
+            cls._cdp_enabled_tabs = set()
+            cls._network_event = asyncio.Event()
         return cls._instance
 
     @classmethod
@@ -87,85 +135,144 @@ class BrowserSession:
             )
 
             # Clear state on new session
-            self._network_logs = []
-            self._console_logs = []
+            self._network_logs = deque(maxlen=MAX_NETWORK_LOGS)
+            self._network_urls_lower = deque(maxlen=MAX_NETWORK_LOGS)
+            self._network_methods = deque(maxlen=MAX_NETWORK_LOGS)
+            self._console_logs = deque(maxlen=MAX_CONSOLE_LOGS)
             self._pending_requests = {}
+            self._recent_requests = OrderedDict()
+            self._log_stage = []
+            self._last_emit_ns = {}
             self._tabs = {}
             self._tab_counter = 0
+            self._flush_task = asyncio.create_task(self._flush_loop())
 
         return self._browser
 
     async def stop(self) -> None:
         """Stop the browser and clean up."""
-        if self._browser is not None:
-            await self._browser.stop()
-            self._browser = None
-            self._page = None
-            self._tabs = {}
-            self._network_logs = []
-            self._console_logs = []
-            self._pending_requests = {}
-            self._cdp_enabled_tabs = {}
+        if self._browser is None:
+            return  # Already stopped
+
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            self._flush_task = None
+        # let in-flight CDP handlers finish before tearing down state
+        if self._running_handlers:
+            await asyncio.gather(*self._running_handlers, return_exceptions=True)
+        await self._browser.stop()
+        self._browser = None
+        self._page = None
+        self._tabs = {}
+        self._network_logs = deque(maxlen=MAX_NETWORK_LOGS)
+        self._network_urls_lower = deque(maxlen=MAX_NETWORK_LOGS)
+        self._network_methods = deque(maxlen=MAX_NETWORK_LOGS)
+        self._console_logs = deque(maxlen=MAX_CONSOLE_LOGS)
+        self._pending_requests = {}
+        self._recent_requests = OrderedDict()
+        self._log_stage = []
+        self._last_emit_ns = {}
+        self._cdp_enabled_tabs = set()
 
     async def _setup_cdp_listeners(self, tab: zd.Tab) -> None:
         """Set up CDP event listeners for network and console logging."""
         tab_id = id(tab)
-        if self._cdp_enabled_tabs.get(tab_id):
+        if tab_id in self._cdp_enabled_tabs:
             return  # Already set up
 
         try:
-            # Enable Network domain
-            await tab.send(cdp.network.enable())
-
-            # Enable Runtime domain for console
-            await tab.send(cdp.runtime.enable())
+            # Enable Network and Runtime (console) domains concurrently
+            await asyncio.gather(
+                tab.send(cdp.network.enable()),
+                tab.send(cdp.runtime.enable())
+            )
 
             # Add event handlers
-            tab.add_handler(cdp.network.RequestWillBeSent, self._on_request_sent)
-            tab.add_handler(cdp.network.ResponseReceived, self._on_response_received)
-            tab.add_handler(cdp.network.LoadingFailed, self._on_loading_failed)
-            tab.add_handler(cdp.runtime.ConsoleAPICalled, self._on_console_api)
+            tab.add_handler(cdp.network.RequestWillBeSent, self._tracked(self._on_request_sent))
+            tab.add_handler(cdp.network.ResponseReceived, self._tracked(self._on_response_received))
+            tab.add_handler(cdp.network.LoadingFailed, self._tracked(self._on_loading_failed))
+            tab.add_handler(cdp.runtime.ConsoleAPICalled, self._tracked(self._on_console_api))
 
             # Mark tab as CDP-enabled
-            self._cdp_enabled_tabs[tab_id] = True
+            self._cdp_enabled_tabs.add(tab_id)
         except Exception:
             # CDP not available or failed, continue without logging
             pass
 
+    def _tracked(self, handler: Callable[[Any], Awaitable[None]]) -> Callable[[Any], Awaitable[None]]:
+        """Wrap a CDP handler so its task is tracked until it finishes.
+
+        zendriver already runs each coroutine handler in its own task, so a slow
+        handler never blocks the others; tracking lets stop() drain them.
+        """
+        async def run(event: Any) -> None:
+            task = asyncio.current_task()
+            if task is not None:
+                self._running_handlers.add(task)
+                task.add_done_callback(self._running_handlers.discard)
+            await handler(event)
+        return run
+
     async def _on_request_sent(self, event: cdp.network.RequestWillBeSent) -> None:
         """Handle outgoing network requests."""
-        request_id = str(event.request_id)
-        self._pending_requests[request_id] = {
+        request_id = event.request_id
+        now = time.time_ns()
+        key = (event.request.method, event.request.url)
+        dedupe = event.type_ not in NO_DEDUP_TYPES
+
+        if dedupe:
+            existing = self._recent_requests.get(key)
+            if existing is not None and now - existing["ts_ns"] < REQUEST_DEDUP_TTL_NS:
+                # share the pending dict so the response only bumps its count
+                existing["count"] += 1
+                self._pending_requests[request_id] = existing
+                self._notify_network()
+                return
+
+        pending = {
             "url": event.request.url,
             "method": event.request.method,
-            "timestamp": datetime.now().isoformat(),
-            "type": str(event.type_) if event.type_ else "unknown"
+            "type": event.type_.value if event.type_ else "unknown",
+            "count": 1,
+            "ts_ns": now
         }
+        self._pending_requests[request_id] = pending
+
+        if dedupe:
+            self._recent_requests[key] = pending
+            self._recent_requests.move_to_end(key)
+            if len(self._recent_requests) > MAX_RECENT_REQUESTS:
+                self._recent_requests.popitem(last=False)
+        self._notify_network()
 
     async def _on_response_received(self, event: cdp.network.ResponseReceived) -> None:
         """Handle network responses."""
-        request_id = str(event.request_id)
+        request_id = event.request_id
         pending = self._pending_requests.pop(request_id, {})
 
+        logged = pending.get("entry")
+        if logged is not None:
+            # duplicate of a request that already has a log entry
+            logged["count"] = pending["count"]
+            self._notify_network()
+            return
+
         log_entry = {
             "url": event.response.url,
             "method": pending.get("method", "GET"),
             "status": event.response.status,
             "status_text": event.response.status_text,
-            "type": str(event.type_) if event.type_ else pending.get("type", "unknown"),
+            "type": event.type_.value if event.type_ else pending.get("type", "unknown"),
             "mime_type": event.response.mime_type,
-            "timestamp": datetime.now().isoformat()
+            "ts_ns": time.time_ns()
         }
-
-        self._network_logs.append(log_entry)
-
-        # Keep only last 1000 entries
-        if len(self._network_logs) > 1000:
-            self._network_logs = self._network_logs[-1000:]
+        if pending:
+            pending["entry"] = log_entry
+        self._stage_network(log_entry)
 
     async def _on_loading_failed(self, event: cdp.network.LoadingFailed) -> None:
         """Handle failed network requests."""
-        request_id = str(event.request_id)
+        request_id = event.request_id
         pending = self._pending_requests.pop(request_id, {})
 
         if pending:
@@ -175,36 +282,95 @@ class BrowserSession:
                 "status": 0,
                 "status_text": f"FAILED: {event.error_text}",
                 "type": pending.get("type", "unknown"),
-                "timestamp": datetime.now().isoformat()
+                "ts_ns": time.time_ns()
             }
-            self._network_logs.append(log_entry)
+            self._stage_network(log_entry)
 
     async def _on_console_api(self, event: cdp.runtime.ConsoleAPICalled) -> None:
         """Handle console API calls."""
-        args_text = []
-        for arg in event.args:
-            if arg.value is not None:
-                args_text.append(str(arg.value))
-            elif arg.preview and arg.preview.properties:
-                # serialize object properties for better display
-                props = {p.name: p.value for p in arg.preview.properties if p.value}
-                args_text.append(str(props) if props else arg.description or str(arg.type_))
-            elif arg.description:
-                args_text.append(arg.description)
-            else:
-                args_text.append(str(arg.type_))
+        # keep the raw argument fields, the text is only built when logs are read
+        args = tuple(
+            (arg.type_, arg.value, arg.description, arg.preview.properties if arg.preview else None)
+            for arg in event.args
+        )
 
         log_entry = {
-            "type": str(event.type_),
-            "text": " ".join(args_text),
-            "timestamp": datetime.now().isoformat()
+            "type": event.type_,
+            "args": args,
+            "ts_ns": time.time_ns()
         }
+        self._stage(("console", log_entry))
+
+    def _stage_network(self, log_entry: Dict[str, Any]) -> None:
+        """Stage a network log entry, dropping repeats of the same request within the rate limit."""
+        status = log_entry["status"]
+        # api calls, documents and failures are distinct events even when the url repeats
+        if log_entry["type"] not in NO_DEDUP_TYPE_VALUES and 0 < status < 400:
+            key = (log_entry["url"], log_entry["method"])
+            now = log_entry["ts_ns"]
+            last = self._last_emit_ns.get(key)
+            if last is not None and now - last < NETWORK_RATE_LIMIT_NS:
+                return
+            self._last_emit_ns[key] = now
+        self._stage(("net", log_entry))
+        self._notify_network()
+
+    def _notify_network(self) -> None:
+        """Record network activity and wake everything waiting on it.
+
+        The event is swapped for a fresh one instead of cleared, so a waiter
+        that was woken can never miss the next notification.
+        """
+        self._network_seq += 1
+        event, self._network_event = self._network_event, asyncio.Event()
+        event.set()
 
-        self._console_logs.append(log_entry)
-
-        # Keep only last 500 entries
-        if len(self._console_logs) > 500:
-            self._console_logs = self._console_logs[-500:]
+    @property
+    def network_seq(self) -> int:
+        """Get the network activity counter."""
+        return self._network_seq
+
+    async def wait_for_network_activity(self, seq: int, timeout: float) -> int:
+        """Wait until the network counter moves past `seq` or `timeout` elapses.
+
+        Returns the current counter, which equals `seq` if nothing happened.
+        """
+        if self._network_seq == seq and timeout > 0:
+            try:
+                await asyncio.wait_for(self._network_event.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self._network_seq
+
+    def _stage(self, item: Tuple[str, Dict[str, Any]]) -> None:
+        """Queue a log entry for the next bulk flush."""
+        self._log_stage.append(item)
+        if len(self._log_stage) >= MAX_STAGED_LOGS:
+            self._flush_logs()
+
+    def _flush_logs(self) -> None:
+        """Move staged entries into the log ring buffers in bulk."""
+        if not self._log_stage:
+            return
+        staged, self._log_stage = self._log_stage, []
+
+        network = [entry for kind, entry in staged if kind == "net"]
+        self._network_logs.extend(network)
+        self._network_urls_lower.extend(entry["url"].lower() for entry in network)
+        self._network_methods.extend(entry["method"] for entry in network)
+        self._network_total += len(network)
+        self._console_logs.extend(entry for kind, entry in staged if kind == "console")
+
+        # forget rate limit keys that are past the window so the dict stays small
+        if len(self._last_emit_ns) > MAX_NETWORK_LOGS:
+            cutoff = time.time_ns() - NETWORK_RATE_LIMIT_NS
+            self._last_emit_ns = {k: v for k, v in self._last_emit_ns.items() if v >= cutoff}
+
+    async def _flush_loop(self) -> None:
+        """Periodically flush staged log entries."""
+        while True:
+            await asyncio.sleep(LOG_FLUSH_INTERVAL)
+            self._flush_logs()
 
     async def navigate(self, url: str, new_tab: bool = False) -> zd.Tab:
         """Navigate to a URL."""
@@ -214,73 +380,147 @@ class BrowserSession:
             # Set up CDP listeners for the new tab
             await self._setup_cdp_listeners(self._page)
             # Track the tab
-            self._tab_counter += 1
-            tab_id = f"tab_{self._tab_counter}"
-            self._tabs[tab_id] = self._page
+            self._register_tab(self._page)
         else:
             # Check if CDP listeners need to be set up for existing page
-            if not self._cdp_enabled_tabs.get(id(self._page)):
+            if id(self._page) not in self._cdp_enabled_tabs:
                 await self._setup_cdp_listeners(self._page)
             await self._page.get(url)
         return self._page
 
+    def _register_tab(self, tab: zd.Tab) -> str:
+        """Assign a tab ID to a newly opened tab and start tracking it."""
+        self._tab_counter += 1
+        tab_num = self._tab_counter
+        self._tabs[tab_num] = tab
+        return f"tab_{tab_num}"
+
+    def _parse_tab_id(self, tab_id: str) -> int:
+        """Convert a public "tab_<n>" ID into the internal tab number."""
+        # strict match with no leading zeros so each tab has exactly one ID,
+        # int() alone would also accept signs, spaces and underscores
+        match = re.fullmatch(r"tab_([1-9][0-9]*)", tab_id)
+        tab_num = int(match.group(1)) if match else None
+        if tab_num not in self._tabs:
+            raise ValueError(f"Tab not found: {tab_id}")
+        return tab_num
+
     async def create_tab(self, url: Optional[str] = None) -> tuple[str, zd.Tab]:
         """Create a new tab and return its ID."""
         browser = self.browser
-        if url:
-            tab = await browser.get(url, new_tab=True)
-        else:
-            tab = await browser.get("about:blank", new_tab=True)
+        url = url or "about:blank"
+        tab = await browser.get(url, new_tab=True)
 
         # Set up CDP listeners for the new tab
         await self._setup_cdp_listeners(tab)
 
-        self._tab_counter += 1
-        tab_id = f"tab_{self._tab_counter}"
-        self._tabs[tab_id] = tab
+        tab_id = self._register_tab(tab)
         return tab_id, tab
 
     async def switch_tab(self, tab_id: str) -> zd.Tab:
         """Switch to a specific tab."""
-        if tab_id not in self._tabs:
-            raise ValueError(f"Tab not found: {tab_id}")
-        self._page = self._tabs[tab_id]
+        self._page = self._tabs[self._parse_tab_id(tab_id)]
         await self._page.bring_to_front()
         return self._page
 
     async def close_tab(self, tab_id: str) -> None:
         """Close a specific tab."""
-        if tab_id not in self._tabs:
-            raise ValueError(f"Tab not found: {tab_id}")
-        tab = self._tabs[tab_id]
+        tab_num = self._parse_tab_id(tab_id)
+        tab = self._tabs[tab_num]
         await tab.close()
-        del self._tabs[tab_id]
+        del self._tabs[tab_num]
 
         # If closed tab was current, switch to another
         if self._page == tab:
             if self._tabs:
-                self._page = list(self._tabs.values())[0]
+                self._page = next(iter(self._tabs.values()))
             else:
                 self._page = None
 
     def get_all_tabs(self) -> Dict[str, str]:
         """Get all open tabs with their URLs."""
-        result = {}
-        for tab_id, tab in self._tabs.items():
-            url = getattr(tab, "url", "unknown")
-            result[tab_id] = url
-        return result
+        # tab.url reads the target info zendriver keeps updated, no CDP call involved
+        return {f"tab_{tab_num}": tab.url for tab_num, tab in self._tabs.items()}
+
+    @staticmethod
+    def _tail(logs: Deque[Dict[str, Any]], limit: int) -> List[Dict[str, Any]]:
+        """Return the last `limit` entries of a log deque (deques don't support slicing)."""
+        size = len(logs)
+        return list(itertools.islice(logs, max(0, size - limit), size))
+
+    @staticmethod
+    def _format_entry(entry: Dict[str, Any]) -> Dict[str, Any]:
+        """Return a copy of a log entry with its ns stamp rendered as an ISO timestamp."""
+        formatted = dict(entry)
+        formatted["timestamp"] = datetime.fromtimestamp(formatted.pop("ts_ns") / 1e9).isoformat()
+        return formatted
+
+    @staticmethod
+    def _format_console_args(args: Tuple[Tuple[Any, Any, Optional[str], Any], ...]) -> str:
+        """Render captured console arguments the way the console would print them."""
+        args_text = []
+        for type_, value, description, properties in args:
+            if value is not None:
+                args_text.append(str(value))
+            elif properties:
+                # serialize object properties for better display
+                props = {p.name: p.value for p in properties if p.value}
+                args_text.append(str(props) if props else description or str(type_))
+            elif description:
+                args_text.append(description)
+            else:
+                args_text.append(str(type_))
+        return " ".join(args_text)
 
     def get_network_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent network logs."""
-        return self._network_logs[-limit:]
+        self._flush_logs()
+        # timestamps are only formatted for the entries actually returned
+        return [self._format_entry(e) for e in self._tail(self._network_logs, limit)]
+
+    def find_network_log(
+        self,
+        pattern: str,
+        method: Optional[str] = None,
+        cursor: int = 0
+    ) -> Tuple[Optional[Dict[str, Any]], int]:
+        """Find the first network log after `cursor` whose URL contains `pattern`.
+
+        `pattern` must already be lowercase. Matching runs over the precomputed
+        URL/method columns, so only the matching entry is formatted. Returns the
+        entry (or None) and the cursor to pass next time. A cursor of 0 searches
+        everything still in the buffer.
+        """
+        self._flush_logs()
+        size = len(self._network_logs)
+        start = size - min(self._network_total - cursor, size)
+        columns = zip(
+            itertools.islice(self._network_urls_lower, start, size),
+            itertools.islice(self._network_methods, start, size),
+            itertools.islice(self._network_logs, start, size),
+        )
+        for url, req_method, entry in columns:
+            if pattern in url and (method is None or req_method == method):
+                return self._format_entry(entry), self._network_total
+        return None, self._network_total
 
     def get_console_logs(self, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent console logs."""
-        return self._console_logs[-limit:]
+        self._flush_logs()
+        logs = []
+        for entry in self._tail(self._console_logs, limit):
+            formatted = self._format_entry(entry)
+            formatted["text"] = self._format_console_args(formatted.pop("args"))
+            logs.append(formatted)
+        return logs
 
     def clear_logs(self) -> None:
         """Clear all logs."""
-        self._network_logs = []
-        self._console_logs = []
+        self._network_logs = deque(maxlen=MAX_NETWORK_LOGS)
+        self._network_urls_lower = deque(maxlen=MAX_NETWORK_LOGS)
+        self._network_methods = deque(maxlen=MAX_NETWORK_LOGS)
+        self._console_logs = deque(maxlen=MAX_CONSOLE_LOGS)
         self._pending_requests = {}
+        self._recent_requests = OrderedDict()
+        self._log_stage = []
+        self._last_emit_ns = {}
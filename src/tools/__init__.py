@@ -76,6 +76,7 @@ set_cookie = _storage_tools.set_cookie
 get_local_storage = _storage_tools.get_local_storage
 set_local_storage = _storage_tools.set_local_storage
 clear_storage = _storage_tools.clear_storage
+bulk_storage = _storage_tools.bulk_storage
 
 # logging
 get_network_logs = _logging_tools.get_network_logs
@@ -123,6 +124,7 @@ __all__ = [
     "find_buttons", "find_inputs",
     "get_content", "get_text_content", "get_interaction_tree", "scroll", "scroll_to_element",
     "get_cookies", "set_cookie", "get_local_storage", "set_local_storage", "clear_storage",
+    "bulk_storage",
     "get_network_logs", "get_console_logs", "clear_logs", "wait_for_network", "wait_for_request",
     "fill_form", "submit_form", "press_key", "press_enter", "mouse_click",
     "screenshot", "execute_js", "wait", "wait_for_element", "run_security_audit",
@@ -1,13 +1,23 @@
 # base class for all tool modules
-import time
+import functools
+import json
 from abc import ABC
-from typing import Any, Callable
+from typing import Any
 
 from mcp.server.fastmcp import FastMCP
 
 from src.session import BrowserSession
 from src.errors import ElementNotFoundError
 
+# translation table for escaping strings interpolated into JavaScript
+_JS_ESCAPES = str.maketrans({
+    "\\": "\\\\",
+    '"': '\\"',
+    "'": "\\'",
+    "\n": "\\n",
+    "\r": "\\r",
+})
+
 
 class ToolBase(ABC):
     """base class providing shared functionality for all tool modules"""
@@ -32,13 +42,10 @@ class ToolBase(ABC):
         return self._mcp
 
     @staticmethod
+    @functools.lru_cache(maxsize=2048)
     def escape_js_string(s: str) -> str:
-        """escape special characters for safe JavaScript string interpolation"""
-        return (s.replace("\\", "\\\\")
-                 .replace('"', '\\"')
-                 .replace("'", "\\'")
-                 .replace("\n", "\\n")
-                 .replace("\r", "\\r"))
+        """escape special characters for safe JavaScript string interpolation (cached, selectors repeat a lot)"""
+        return s.translate(_JS_ESCAPES)
 
     async def get_element(self, selector: str):
         """get element by selector, raise error if not found"""
@@ -54,12 +61,22 @@ class ToolBase(ABC):
             raise ElementNotFoundError(f"text='{text}'")
         return elem
 
-    async def run_js(self, script: str) -> Any:
-        """execute JavaScript and return result"""
-        return await self._session.page.evaluate(script)
+    async def run_js(self, script: str, await_promise: bool = False) -> Any:
+        """execute JavaScript and return result, optionally waiting for a returned promise to settle"""
+        return await self._session.page.evaluate(script, await_promise=await_promise)
+
+    @staticmethod
+    def build_js_call(function: str, *args: Any) -> str:
+        """build the expression calling a JavaScript function source with JSON-encoded arguments"""
+        arg_list = ", ".join(json.dumps(arg) for arg in args)
+        return f"({function})({arg_list})"
 
-    async def check_visibility(self, selector: str) -> dict:
-        """check if element exists and is visible"""
+    async def call_js(self, function: str, *args: Any) -> Any:
+        """call a JavaScript function source with JSON-encoded arguments (no escaping needed)"""
+        return await self.run_js(self.build_js_call(function, *args))
+
+    async def check_and_locate(self, selector: str) -> dict:
+        """check element visibility and get its viewport center in a single round-trip"""
         safe_sel = self.escape_js_string(selector)
         return await self.run_js(f'''
             (function() {{
@@ -67,30 +84,23 @@ class ToolBase(ABC):
                 if (!el) return {{ found: false }};
                 const style = window.getComputedStyle(el);
                 const hidden = style.display === "none" || style.visibility === "hidden";
-                return {{ found: true, hidden: hidden, tag: el.tagName }};
+                if (hidden) return {{ found: true, hidden: true, tag: el.tagName }};
+                // instant, so a smooth scroll-behavior can't leave the rect below stale
+                el.scrollIntoView({{ block: "center", inline: "center", behavior: "instant" }});
+                const rect = el.getBoundingClientRect();
+                const x = rect.left + rect.width / 2, y = rect.top + rect.height / 2;
+                const top = document.elementFromPoint(x, y);
+                const covered = !top || (top !== el && !el.contains(top));
+                return {{ found: true, hidden: false, tag: el.tagName, x: x, y: y, covered: covered }};
             }})()
         ''')
 
-    async def wait_for_condition(
-        self,
-        check_fn: Callable,
-        timeout: float,
-        poll_interval: float = 0.5
-    ) -> bool:
-        """wait for a condition to be true within timeout"""
-        start = time.time()
-        while time.time() - start < timeout:
-            if await check_fn():
-                return True
-            await self._session.page.wait(poll_interval)
-        return False
-
     @staticmethod
     def truncate(text: str, max_length: int, suffix: str = "\n... (truncated)") -> str:
         """truncate text if it exceeds max length"""
-        if len(text) > max_length:
-            return text[:max_length] + suffix
-        return text
+        if len(text) <= max_length:
+            return text  # common case, no copy
+        return "".join((text[:max_length], suffix))
 
     @staticmethod
     def bool_to_yes_no(value: bool) -> str:
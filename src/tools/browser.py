@@ -20,6 +20,9 @@ class BrowserTools(ToolBase):
         user_data_dir: Optional[str] = None
     ) -> str:
         """Start the browser with configuration options."""
+        if self.session.is_browser_started():
+            return "Browser already running. Call stop_browser first to restart with new options."
+
         await self.session.start(headless=headless, proxy=proxy, user_data_dir=user_data_dir)
 
         # build response message
@@ -34,6 +37,8 @@ class BrowserTools(ToolBase):
 
     async def stop_browser(self) -> str:
         """Stop the browser and clean up all resources."""
+        if not self.session.is_browser_started():
+            return "Browser not running"
         await self.session.stop()
         return "Browser stopped and all resources cleaned up"
 
@@ -44,7 +49,9 @@ class BrowserTools(ToolBase):
 
         # list all open tabs
         tabs = self.session.get_all_tabs()
-        lines = [f"Browser: Running", f"Open tabs: {len(tabs)}"]
-        for tab_id, url in tabs.items():
-            lines.append(f"  - {tab_id}: {url}")
+        lines = [
+            "Browser: Running",
+            f"Open tabs: {len(tabs)}",
+            *[f"  - {tab_id}: {url}" for tab_id, url in tabs.items()]
+        ]
         return "\n".join(lines)
@@ -1,6 +1,22 @@
 # page content tools - get html, get text, scroll
+import json
+import os
+
 from src.tools.base import ToolBase
 
+# the dom walker is a static asset, so read it once at import
+_DOM_WALKER_PATH = os.path.join(os.path.dirname(__file__), "..", "static", "js", "dom_walker.js")
+if os.path.exists(_DOM_WALKER_PATH):
+    with open(_DOM_WALKER_PATH, "r", encoding="utf-8") as f:
+        _DOM_WALKER_JS = f.read()
+else:
+    _DOM_WALKER_JS = None
+
+_SCROLL_TO_ELEMENT_JS = """(sel) => {
+    const el = document.querySelector(sel);
+    if (el) el.scrollIntoView({ behavior: "smooth", block: "center" });
+}"""
+
 
 class ContentTools(ToolBase):
     """tools for page content and scrolling"""
@@ -29,19 +45,11 @@ class ContentTools(ToolBase):
         Uses a sophisticated heuristic to find interactive elements (buttons, inputs, 
         shadow DOM components), assigns them unique IDs, and returns a clean list.
         """
-        import json
-        import os
-        
-        # Load the JS walker script
-        script_path = os.path.join(os.path.dirname(__file__), "..", "static", "js", "dom_walker.js")
-        if not os.path.exists(script_path):
+        if _DOM_WALKER_JS is None:
             return "Error: dom_walker.js not found in static/js"
-            
-        with open(script_path, "r", encoding="utf-8") as f:
-            js_code = f.read()
 
         try:
-            tree = await self.run_js(js_code)
+            tree = await self.run_js(_DOM_WALKER_JS)
             return json.dumps(tree, indent=2)
         except Exception as e:
             return f"Error analyzing page: {str(e)}"
@@ -59,6 +67,5 @@ class ContentTools(ToolBase):
 
     async def scroll_to_element(self, selector: str) -> str:
         """Scroll to bring an element into view."""
-        safe_sel = self.escape_js_string(selector)
-        await self.run_js(f'document.querySelector("{safe_sel}")?.scrollIntoView({{behavior: "smooth", block: "center"}})')
+        await self.call_js(_SCROLL_TO_ELEMENT_JS, selector)
         return f"Scrolled to: {selector}"
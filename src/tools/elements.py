@@ -4,6 +4,15 @@ from typing import Optional
 from src.tools.base import ToolBase
 from src.errors import ElementNotFoundError
 
+# constant function source so the page compiles the same script every call
+_SELECT_OPTION_JS = """(sel, val) => {
+    const select = document.querySelector(sel);
+    if (!select) return false;
+    select.value = val;
+    select.dispatchEvent(new Event("change", { bubbles: true }));
+    return true;
+}"""
+
 
 class ElementTools(ToolBase):
     """tools for interacting with page elements"""
@@ -23,13 +32,18 @@ class ElementTools(ToolBase):
             if selector.isdigit():
                 selector = f'[data-zendriver-id="{selector}"]'
 
-            check = await self.check_visibility(selector)
+            check = await self.check_and_locate(selector)
             if not check['found']:
                 if '[data-zendriver-id=' in selector:
                      return "Error: ID not found. The page may have changed. Please run get_interaction_tree() again."
                 raise ElementNotFoundError(selector)
             if check.get('hidden'):
                 return f"Error: Element '{selector}' is hidden. Cannot click."
+            if not check.get('covered'):
+                # native click at the element center, no node resolution needed
+                await self.session.page.mouse_click(check['x'], check['y'])
+                return f"Clicked: {selector}"
+            # something overlays the element center, dispatch the click on the element itself
             elem = await self.session.page.select(selector)
             if elem:
                 await elem.click()
@@ -87,14 +101,11 @@ class ElementTools(ToolBase):
         if selector.isdigit():
             selector = f'[data-zendriver-id="{selector}"]'
 
-        await self.get_element(selector)
-        safe_sel = self.escape_js_string(selector)
-        safe_val = self.escape_js_string(value)
-        await self.run_js(f'''
-            const select = document.querySelector("{safe_sel}");
-            select.value = "{safe_val}";
-            select.dispatchEvent(new Event("change", {{ bubbles: true }}));
-        ''')
+        if not await self.call_js(_SELECT_OPTION_JS, selector, value):
+            # not rendered yet, wait for it like the other element tools do and try again
+            await self.get_element(selector)
+            if not await self.call_js(_SELECT_OPTION_JS, selector, value):
+                raise ElementNotFoundError(selector)
         return f"Selected '{value}' in: {selector}"
 
     async def upload_file(self, selector: str, file_path: str) -> str:
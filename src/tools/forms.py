@@ -4,6 +4,116 @@ from typing import Optional
 
 from src.tools.base import ToolBase
 
+# fills every field in one page round-trip, returns the selectors that matched
+_FILL_FORM_JS = """(fields) => {
+    const filled = [];
+    for (const [sel, value] of Object.entries(fields)) {
+        const el = document.querySelector(sel);
+        if (!el) continue;
+        el.focus();
+        if (el.isContentEditable) {
+            el.textContent = value;
+        } else {
+            // use the native setter so framework-controlled inputs see the change
+            const setter = Object.getOwnPropertyDescriptor(Object.getPrototypeOf(el), "value")?.set;
+            if (setter) setter.call(el, value); else el.value = value;
+        }
+        el.dispatchEvent(new Event("input", { bubbles: true }));
+        el.dispatchEvent(new Event("change", { bubbles: true }));
+        filled.push(sel);
+    }
+    return filled;
+}"""
+
+# map common key names to their codes
+_KEY_CODES = {
+    'Enter': 13, 'Tab': 9, 'Escape': 27, 'Backspace': 8, 'Delete': 46,
+    'ArrowUp': 38, 'ArrowDown': 40, 'ArrowLeft': 37, 'ArrowRight': 39,
+    'Space': 32, ' ': 32, 'Home': 36, 'End': 35, 'PageUp': 33, 'PageDown': 34
+}
+_KEY_CODES_JSON = json.dumps(_KEY_CODES)
+
+# elements Tab can move focus to
+_FOCUSABLE_SELECTOR_JSON = json.dumps(", ".join([
+    "button",
+    "[href]",
+    'input:not([type="hidden"])',
+    "select",
+    "textarea",
+    '[tabindex]:not([tabindex="-1"])',
+]))
+
+# keydown/keypress/keyup simulation, filled in with str.format so braces are doubled
+_PRESS_KEY_JS_TEMPLATE = """
+(function() {{
+    const el = {target_js};
+    if (!el) return;
+
+    const key = "{safe_key}";
+    const keyCode = {key_codes_json};
+    const code = keyCode[key] || key.charCodeAt(0);
+
+    // one options object shared by keydown, keypress and keyup
+    const eventOptions = {{
+        key: key,
+        code: key.length === 1 ? "Key" + key.toUpperCase() : key,
+        keyCode: code,
+        which: code,
+        charCode: key === "Enter" ? 13 : 0,
+        bubbles: true,
+        cancelable: true,
+        composed: true
+    }};
+
+    // dispatch keydown
+    const keydownResult = el.dispatchEvent(new KeyboardEvent("keydown", eventOptions));
+
+    // dispatch keypress for character keys (deprecated but some frameworks need it)
+    if (key.length === 1 || key === "Enter") {{
+        el.dispatchEvent(new KeyboardEvent("keypress", eventOptions));
+    }}
+
+    // special handling for Enter key
+    if (key === "Enter") {{
+        // check if element is in a form
+        const form = el.closest("form");
+        if (form && el.tagName !== "TEXTAREA") {{
+            // trigger form submission
+            const submitEvent = new Event("submit", {{ bubbles: true, cancelable: true }});
+            const submitted = form.dispatchEvent(submitEvent);
+            if (submitted && !submitEvent.defaultPrevented) {{
+                // find submit button and click it, or submit form
+                const submitBtn = form.querySelector('[type="submit"], button:not([type="button"])');
+                if (submitBtn) {{
+                    submitBtn.click();
+                }}
+            }}
+        }}
+        // also dispatch click on buttons
+        if (el.tagName === "BUTTON" || el.getAttribute("role") === "button") {{
+            el.click();
+        }}
+    }}
+
+    // special handling for Tab key
+    if (key === "Tab" && keydownResult) {{
+        // move focus to the first usable focusable element after this one
+        let passedCurrent = false;
+        for (const candidate of document.querySelectorAll({focusable_selector_json})) {{
+            if (candidate === el) {{
+                passedCurrent = true;
+            }} else if (passedCurrent && !candidate.disabled && candidate.offsetParent !== null) {{
+                candidate.focus();
+                break;
+            }}
+        }}
+    }}
+
+    // dispatch keyup
+    el.dispatchEvent(new KeyboardEvent("keyup", eventOptions));
+}})()
+"""
+
 
 class FormTools(ToolBase):
     """tools for forms and input handling"""
@@ -17,18 +127,24 @@ class FormTools(ToolBase):
         self._mcp.tool()(self.mouse_click)
 
     async def fill_form(self, form_data: str) -> str:
-        """Fill a form with multiple fields. Pass JSON like '{"#email": "test@test.com"}'."""
-        data = json.loads(form_data)
-        filled = []
+        """Fill a form with multiple fields. Pass JSON like '{"#email": "test@test.com"}'.
 
-        for selector, value in data.items():
-            elem = await self.session.page.select(selector)
-            if elem:
-                await elem.clear_input()
-                await elem.send_keys(str(value))
-                filled.append(selector)
-
-        return f"Filled {len(filled)} field(s): {', '.join(filled)}"
+        Fields are filled as the page is now, selectors that match nothing are listed as not found.
+        """
+        data = json.loads(form_data)
+        # most values are already strings, only convert the rest
+        fields = {
+            selector: value if type(value) is str else str(value)
+            for selector, value in data.items()
+        }
+        filled = await self.call_js(_FILL_FORM_JS, fields) or []
+        result = f"Filled {len(filled)} field(s): {', '.join(filled)}"
+        # fields are not waited for, report the ones that matched nothing so a partial fill is visible
+        filled_set = set(filled)
+        missing = [selector for selector in fields if selector not in filled_set]
+        if missing:
+            result += f"\nNot found: {', '.join(missing)}"
+        return result
 
     async def submit_form(self, selector: str = "form") -> str:
         """Submit a form."""
@@ -47,90 +163,18 @@ class FormTools(ToolBase):
         """
         safe_key = self.escape_js_string(key)
 
-        # map common key names to their codes
-        key_codes = {
-            'Enter': 13, 'Tab': 9, 'Escape': 27, 'Backspace': 8, 'Delete': 46,
-            'ArrowUp': 38, 'ArrowDown': 40, 'ArrowLeft': 37, 'ArrowRight': 39,
-            'Space': 32, ' ': 32, 'Home': 36, 'End': 35, 'PageUp': 33, 'PageDown': 34
-        }
-
         if selector:
             safe_sel = self.escape_js_string(selector)
             target_js = f'document.querySelector("{safe_sel}")'
         else:
             target_js = 'document.activeElement'
 
-        await self.run_js(f'''
-            (function() {{
-                const el = {target_js};
-                if (!el) return;
-
-                const key = "{safe_key}";
-                const keyCode = {json.dumps(key_codes)};
-                const code = keyCode[key] || key.charCodeAt(0);
-
-                // create event options
-                const eventOptions = {{
-                    key: key,
-                    code: key.length === 1 ? "Key" + key.toUpperCase() : key,
-                    keyCode: code,
-                    which: code,
-                    charCode: key === "Enter" ? 13 : 0,
-                    bubbles: true,
-                    cancelable: true,
-                    composed: true
-                }};
-
-                // dispatch keydown
-                const keydownEvent = new KeyboardEvent("keydown", eventOptions);
-                const keydownResult = el.dispatchEvent(keydownEvent);
-
-                // dispatch keypress for character keys (deprecated but some frameworks need it)
-                if (key.length === 1 || key === "Enter") {{
-                    const keypressEvent = new KeyboardEvent("keypress", eventOptions);
-                    el.dispatchEvent(keypressEvent);
-                }}
-
-                // special handling for Enter key
-                if (key === "Enter") {{
-                    // check if element is in a form
-                    const form = el.closest("form");
-                    if (form && el.tagName !== "TEXTAREA") {{
-                        // trigger form submission
-                        const submitEvent = new Event("submit", {{ bubbles: true, cancelable: true }});
-                        const submitted = form.dispatchEvent(submitEvent);
-                        if (submitted && !submitEvent.defaultPrevented) {{
-                            // find submit button and click it, or submit form
-                            const submitBtn = form.querySelector('[type="submit"], button:not([type="button"])');
-                            if (submitBtn) {{
-                                submitBtn.click();
-                            }}
-                        }}
-                    }}
-                    // also dispatch click on buttons
-                    if (el.tagName === "BUTTON" || el.getAttribute("role") === "button") {{
-                        el.click();
-                    }}
-                }}
-
-                // special handling for Tab key
-                if (key === "Tab" && keydownResult) {{
-                    // move focus to next focusable element
-                    const focusable = Array.from(document.querySelectorAll(
-                        'button, [href], input:not([type="hidden"]), select, textarea, [tabindex]:not([tabindex="-1"])'
-                    )).filter(e => !e.disabled && e.offsetParent !== null);
-
-                    const currentIndex = focusable.indexOf(el);
-                    if (currentIndex !== -1 && currentIndex < focusable.length - 1) {{
-                        focusable[currentIndex + 1].focus();
-                    }}
-                }}
-
-                // dispatch keyup
-                const keyupEvent = new KeyboardEvent("keyup", eventOptions);
-                el.dispatchEvent(keyupEvent);
-            }})()
-        ''')
+        await self.run_js(_PRESS_KEY_JS_TEMPLATE.format(
+            target_js=target_js,
+            safe_key=safe_key,
+            key_codes_json=_KEY_CODES_JSON,
+            focusable_selector_json=_FOCUSABLE_SELECTOR_JSON,
+        ))
         return f"Pressed key: {key}" + (f" on {selector}" if selector else "")
 
     async def press_enter(self, selector: Optional[str] = None) -> str:
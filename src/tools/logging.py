@@ -1,5 +1,5 @@
 # logging tools - network and console log management
-import time
+import asyncio
 from typing import Optional
 
 from src.tools.base import ToolBase
@@ -22,13 +22,12 @@ class LoggingTools(ToolBase):
         if not logs:
             return "No network logs captured"
 
-        lines = [f"Network logs ({len(logs)} entries):"]
-        for log in logs:
-            method = log.get('method', 'GET')
-            url = log.get('url', 'unknown')[:80]
-            status = log.get('status', '?')
-            lines.append(f"  {method} {url} - {status}")
-        return "\n".join(lines)
+        header = f"Network logs ({len(logs)} entries):\n"
+        return header + "\n".join(
+            f"  {log.get('method', 'GET')} {log.get('url', 'unknown')[:80]} - {log.get('status', '?')}"
+            + (f" (x{log['count']})" if log.get('count', 1) > 1 else "")
+            for log in logs
+        )
 
     async def get_console_logs(self, limit: int = 50) -> str:
         """Get recent console logs captured via CDP."""
@@ -36,12 +35,10 @@ class LoggingTools(ToolBase):
         if not logs:
             return "No console logs captured"
 
-        lines = [f"Console logs ({len(logs)} entries):"]
-        for log in logs:
-            log_type = log.get('type', 'log')
-            text = log.get('text', '')[:100]
-            lines.append(f"  [{log_type}] {text}")
-        return "\n".join(lines)
+        header = f"Console logs ({len(logs)} entries):\n"
+        return header + "\n".join(
+            f"  [{log.get('type', 'log')}] {log.get('text', '')[:100]}" for log in logs
+        )
 
     async def clear_logs(self) -> str:
         """Clear all captured network and console logs."""
@@ -57,30 +54,24 @@ class LoggingTools(ToolBase):
             timeout: Maximum time to wait in seconds
             idle_time: How long network must be idle to consider it done
         """
-        start = time.time()
-        last_count = 0
-        idle_start = None
-
-        while time.time() - start < timeout:
-            logs = self.session.get_network_logs(100)
-            current_count = len(logs)
-
-            if current_count == last_count:
-                # no new requests
-                if idle_start is None:
-                    idle_start = time.time()
-                elif time.time() - idle_start >= idle_time:
-                    # network has been idle long enough
-                    elapsed = time.time() - start
-                    return f"Network idle after {elapsed:.1f}s ({current_count} requests captured)"
-            else:
-                # new request came in, reset idle timer
-                idle_start = None
-                last_count = current_count
-
-            await self.session.page.wait(0.1)
-
-        return f"Timeout after {timeout}s - network may still be active ({last_count} requests captured)"
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        seq = self.session.network_seq
+
+        while (now := loop.time()) < deadline:
+            wait = min(idle_time, deadline - now)
+            new_seq = await self.session.wait_for_network_activity(seq, wait)
+            if new_seq == seq and wait >= idle_time:
+                # network has been idle long enough
+                elapsed = loop.time() - start
+                count = len(self.session.get_network_logs(100))
+                return f"Network idle after {elapsed:.1f}s ({count} requests captured)"
+            # new request came in, restart the idle window
+            seq = new_seq
+
+        count = len(self.session.get_network_logs(100))
+        return f"Timeout after {timeout}s - network may still be active ({count} requests captured)"
 
     async def wait_for_request(
         self,
@@ -97,38 +88,28 @@ class LoggingTools(ToolBase):
 
         Returns info about the matching request when found.
         """
-        start = time.time()
-        seen_requests = set()
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        deadline = start + timeout
+        cursor = 0
         safe_pattern = url_pattern.lower()
         safe_method = method.upper() if method else None
 
-        while time.time() - start < timeout:
-            logs = self.session.get_network_logs(200)
-
-            for log in logs:
-                # create unique id for this request
-                req_id = f"{log.get('method', '')}:{log.get('url', '')}:{log.get('timestamp', '')}"
-                if req_id in seen_requests:
-                    continue
-                seen_requests.add(req_id)
-
-                url = log.get('url', '').lower()
-                req_method = log.get('method', 'GET')
-
-                # check if this request matches our pattern
-                if safe_pattern in url:
-                    if safe_method and req_method != safe_method:
-                        continue
-
-                    status = log.get('status', '?')
-                    elapsed = time.time() - start
-                    return (
-                        f"Found matching request after {elapsed:.1f}s:\n"
-                        f"  {req_method} {log.get('url', '')[:100]}\n"
-                        f"  Status: {status}\n"
-                        f"  Type: {log.get('type', 'unknown')}"
-                    )
-
-            await self.session.page.wait(0.2)
+        while (now := loop.time()) < deadline:
+            # snapshot before scanning so activity during the scan still wakes us
+            seq = self.session.network_seq
+            # only entries captured since the last pass are inspected
+            log, cursor = self.session.find_network_log(safe_pattern, safe_method, cursor)
+
+            if log is not None:
+                elapsed = now - start
+                return (
+                    f"Found matching request after {elapsed:.1f}s:\n"
+                    f"  {log.get('method', 'GET')} {log.get('url', '')[:100]}\n"
+                    f"  Status: {log.get('status', '?')}\n"
+                    f"  Type: {log.get('type', 'unknown')}"
+                )
+
+            await self.session.wait_for_network_activity(seq, deadline - now)
 
         return f"Timeout: No request matching '{url_pattern}' found after {timeout}s"
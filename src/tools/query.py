@@ -3,6 +3,286 @@ from typing import Optional
 
 from src.tools.base import ToolBase
 
+# looks up a selector and returns its details, or suggestions when nothing matches
+_FIND_ELEMENT_JS = """(sel) => {
+    let el = null;
+    try { el = document.querySelector(sel); } catch (e) {}
+    if (!el) {
+        // provide helpful suggestions
+        const found = [];
+        const ce = document.querySelector('[contenteditable="true"]');
+        if (ce) found.push({ sel: '[contenteditable="true"]', tag: ce.tagName });
+        const tb = document.querySelector('[role="textbox"]');
+        if (tb) found.push({ sel: '[role="textbox"]', tag: tb.tagName });
+        const ta = document.querySelector('textarea');
+        if (ta) found.push({ sel: 'textarea', tag: 'TEXTAREA' });
+        const inp = document.querySelector('input:not([type="hidden"])');
+        if (inp) found.push({ sel: 'input', tag: 'INPUT', type: inp.type });
+        const btn = document.querySelector('button');
+        if (btn) found.push({ sel: 'button', tag: 'BUTTON' });
+        return { found: false, suggestions: found.slice(0, 5) };
+    }
+    const style = window.getComputedStyle(el);
+    return {
+        found: true,
+        tag: el.tagName.toLowerCase(),
+        text: (el.innerText || el.textContent || "").trim().slice(0, 200),
+        visible: style.display !== "none" && style.visibility !== "hidden",
+        editable: el.isContentEditable || el.tagName === "INPUT" || el.tagName === "TEXTAREA",
+        clickable: el.tagName === "BUTTON" || el.tagName === "A" || el.onclick !== null
+    };
+}"""
+
+# counts all matches but only serializes the first `limit` of them
+_FIND_ALL_ELEMENTS_JS = """(sel, limit) => {
+    let matches;
+    try { matches = document.querySelectorAll(sel); } catch (e) { return { total: 0, items: [] }; }
+    const items = [];
+    for (let i = 0; i < matches.length && i < limit; i++) {
+        const el = matches[i];
+        items.push({
+            tag: el.tagName.toLowerCase(),
+            text: (el.innerText || el.textContent || "").trim().slice(0, 50)
+        });
+    }
+    return { total: matches.length, items };
+}"""
+
+# page scripts for find_buttons/find_inputs, {FILTER} is replaced with the escaped filter text
+_FIND_BUTTONS_JS_TMPL = """
+(function() {
+    const filter = "{FILTER}".toLowerCase();
+    const results = [];
+
+    // button-like elements, queried together
+    const SELECTORS = [
+        "button",
+        "input[type='submit']",
+        "input[type='button']",
+        "[role='button']",
+        "a[href='#']",
+        "a[href='javascript:']",
+        "[onclick]"
+    ];
+    const ESCAPE_CSS_RE = /([!"#$%&'()*+,./:;<=>?@[\\]^`{|}~])/g;
+    const INVALID_CLASS_RE = /[!"#$%&'()*+,./:;<=>?@\\^`{|}~]/;
+    const CLASS_START_RE = /^[a-zA-Z_-]/;
+
+    // cheap display check first: offsetParent is null for display:none subtrees,
+    // but also for position:fixed, so only those fall back to computed style
+    function isHidden(el) {
+        if (el.offsetParent === null &&
+            (getComputedStyle(el).position !== "fixed" || el.getClientRects().length === 0)) return true;
+        // visibility:hidden keeps offsetParent set, and click() refuses those elements
+        return el.checkVisibility
+            ? !el.checkVisibility({ visibilityProperty: true })
+            : getComputedStyle(el).visibility === "hidden";
+    }
+
+    // helper to get button description
+    function getDescription(el) {
+        // check text content
+        const text = el.innerText?.trim();
+        if (text) return text;
+
+        // check aria-label
+        const ariaLabel = el.getAttribute("aria-label");
+        if (ariaLabel) return ariaLabel;
+
+        // check title
+        const title = el.getAttribute("title");
+        if (title) return title;
+
+        // check for icon (svg, img, i tag)
+        const svg = el.querySelector("svg");
+        if (svg) {
+            const svgTitle = svg.querySelector("title")?.textContent;
+            if (svgTitle) return "Icon: " + svgTitle;
+            const use = svg.querySelector("use");
+            if (use) {
+                const href = use.getAttribute("href") || use.getAttribute("xlink:href");
+                if (href) return "Icon: " + href.split("#").pop();
+            }
+            return "Icon button";
+        }
+
+        const img = el.querySelector("img");
+        if (img) return "Image: " + (img.alt || img.src.split("/").pop());
+
+        const icon = el.querySelector("i, span[class*='icon']");
+        if (icon) return "Icon: " + (icon.className || "unknown");
+
+        return "(no description)";
+    }
+
+    // candidates often share aria-labels and classes, so each selector is only counted once
+    const qsaCount = new Map();
+    function countMatches(sel) {
+        let count = qsaCount.get(sel);
+        if (count === undefined) {
+            try {
+                count = document.querySelectorAll(sel).length;
+            } catch(e) {
+                count = 0;
+            }
+            qsaCount.set(sel, count);
+        }
+        return count;
+    }
+
+    // helper to escape CSS selector special characters
+    function escapeCSS(str) {
+        return str.replace(ESCAPE_CSS_RE, '\\\\$1');
+    }
+
+    // helper to check if class is valid for CSS selector
+    function isValidClass(c) {
+        // skip Tailwind responsive/state prefixes and complex classes
+        if (c.includes(':') || c.includes('[') || c.includes(']') || c.includes('/')) return false;
+        if (c.includes('hover') || c.includes('active') || c.includes('focus') || c.includes('visible')) return false;
+        // skip classes with special CSS chars that would need escaping
+        if (INVALID_CLASS_RE.test(c)) return false;
+        // skip very short generic classes or very long ones
+        if (c.length < 2 || c.length > 30) return false;
+        // must start with a letter or hyphen
+        if (!CLASS_START_RE.test(c)) return false;
+        return true;
+    }
+
+    // helper to get unique selector
+    function getSelector(el) {
+        // prefer ID
+        if (el.id) return "#" + escapeCSS(el.id);
+
+        // prefer name attribute
+        if (el.name) return el.tagName.toLowerCase() + "[name='" + el.name + "']";
+
+        // try aria-label
+        const ariaLabel = el.getAttribute("aria-label");
+        if (ariaLabel && ariaLabel.length < 50) {
+            const sel = el.tagName.toLowerCase() + "[aria-label='" + ariaLabel.replace(/'/g, "\\'") + "']";
+            if (countMatches(sel) === 1) return sel;
+        }
+
+        // try data-testid or data-id
+        const testId = el.getAttribute("data-testid") || el.getAttribute("data-id");
+        if (testId) {
+            return el.tagName.toLowerCase() + "[data-testid='" + testId + "']";
+        }
+
+        // try simple classes only (no Tailwind prefixes)
+        const classes = Array.from(el.classList).filter(isValidClass);
+        if (classes.length > 0) {
+            const escapedClasses = classes.slice(0, 2).map(escapeCSS).join(".");
+            const sel = el.tagName.toLowerCase() + "." + escapedClasses;
+            if (countMatches(sel) === 1) return sel;
+        }
+
+        // fallback: use data attributes
+        for (const attr of el.attributes) {
+            if (attr.name.startsWith("data-") && attr.value && attr.value.length < 50) {
+                const sel = el.tagName.toLowerCase() + "[" + attr.name + "='" + attr.value.replace(/'/g, "\\'") + "']";
+                if (countMatches(sel) === 1) return sel;
+            }
+        }
+
+        // last resort: nth-of-type, counting same-tag siblings before the element
+        if (el.parentElement) {
+            let index = 1;
+            for (let sib = el.previousElementSibling; sib; sib = sib.previousElementSibling) {
+                if (sib.tagName === el.tagName) index++;
+            }
+            return el.tagName.toLowerCase() + ":nth-of-type(" + index + ")";
+        }
+
+        return el.tagName.toLowerCase();
+    }
+
+    // one grouped query walks the DOM once and returns each element only once
+    for (const el of document.querySelectorAll(SELECTORS.join(","))) {
+        if (isHidden(el)) continue;
+
+        const desc = getDescription(el);
+        if (filter && !desc.toLowerCase().includes(filter)) continue;
+
+        results.push({
+            selector: getSelector(el),
+            tag: el.tagName,
+            description: desc.substring(0, 50),
+            type: el.type || el.getAttribute("role") || "button"
+        });
+    }
+
+    return results.slice(0, 20);
+})()
+"""
+
+_FIND_INPUTS_JS_TMPL = """
+(function() {
+    const filter = "{FILTER}".toLowerCase();
+
+    // offsetParent is only null for display:none, position:fixed, display:contents and body,
+    // so style is resolved for few elements, and rejecting a display:none element prunes its subtree
+    function acceptNode(el) {
+        if (el.offsetParent === null && getComputedStyle(el).display === "none") return NodeFilter.FILTER_REJECT;
+        if (el.tagName === "INPUT" || el.tagName === "TEXTAREA") {
+            return el.type === "hidden" ? NodeFilter.FILTER_SKIP : NodeFilter.FILTER_ACCEPT;
+        }
+        if (el.getAttribute("contenteditable") === "true" || el.getAttribute("role") === "textbox") {
+            return NodeFilter.FILTER_ACCEPT;
+        }
+        return NodeFilter.FILTER_SKIP;
+    }
+
+    function getSelector(el) {
+        if (el.id) return "#" + el.id;
+        if (el.name) return el.tagName.toLowerCase() + "[name='" + el.name + "']";
+        if (el.placeholder) return el.tagName.toLowerCase() + "[placeholder='" + el.placeholder.substring(0, 30) + "']";
+
+        const classes = Array.from(el.classList || []).filter(c => c.length < 30);
+        if (classes.length > 0) return el.tagName.toLowerCase() + "." + classes[0];
+
+        return el.tagName.toLowerCase();
+    }
+
+    function getDescription(el) {
+        const label = document.querySelector("label[for='" + el.id + "']");
+        if (label) return label.textContent.trim();
+        if (el.placeholder) return el.placeholder;
+        if (el.ariaLabel) return el.ariaLabel;
+        return el.name || el.type || "input";
+    }
+
+    // one walk finds both standard inputs and rich text fields, standard inputs are listed first
+    const richTextMatches = !filter || ["text", "contenteditable", "textbox"].some(t => t.includes(filter));
+    const inputs = [];
+    const richText = [];
+    const walker = document.createTreeWalker(
+        document.body || document.documentElement, NodeFilter.SHOW_ELEMENT, { acceptNode }
+    );
+    for (let el = walker.nextNode(); el && inputs.length < 20; el = walker.nextNode()) {
+        if (el.tagName === "INPUT" || el.tagName === "TEXTAREA") {
+            const inputType = el.type || "text";
+            if (filter && !inputType.includes(filter)) continue;
+
+            inputs.push({
+                selector: getSelector(el),
+                type: inputType,
+                description: getDescription(el).substring(0, 40)
+            });
+        } else if (richTextMatches) {
+            richText.push({
+                selector: getSelector(el),
+                type: el.getAttribute("role") || "contenteditable",
+                description: el.ariaLabel || el.placeholder || "rich text editor"
+            });
+        }
+    }
+
+    return inputs.concat(richText).slice(0, 20);
+})()
+"""
+
 
 class QueryTools(ToolBase):
     """tools for querying and inspecting elements"""
@@ -24,56 +304,20 @@ class QueryTools(ToolBase):
         page = self.session.page
 
         if selector:
-            try:
-                elem = await page.select(selector, timeout=2)
-            except Exception:
-                elem = None
-
-            if elem is None:
-                # provide helpful suggestions
-                suggestions = await self.run_js('''
-                    (function() {
-                        const found = [];
-                        const ce = document.querySelector('[contenteditable="true"]');
-                        if (ce) found.push({ sel: '[contenteditable="true"]', tag: ce.tagName });
-                        const tb = document.querySelector('[role="textbox"]');
-                        if (tb) found.push({ sel: '[role="textbox"]', tag: tb.tagName });
-                        const ta = document.querySelector('textarea');
-                        if (ta) found.push({ sel: 'textarea', tag: 'TEXTAREA' });
-                        const inp = document.querySelector('input:not([type="hidden"])');
-                        if (inp) found.push({ sel: 'input', tag: 'INPUT', type: inp.type });
-                        const btn = document.querySelector('button');
-                        if (btn) found.push({ sel: 'button', tag: 'BUTTON' });
-                        return found.slice(0, 5);
-                    })()
-                ''')
+            info = await self.call_js(_FIND_ELEMENT_JS, selector) or {}
 
+            if not info.get('found'):
                 msg = f"Element not found: {selector}"
+                suggestions = info.get('suggestions')
                 if suggestions:
                     suggestions_text = ", ".join([s['sel'] for s in suggestions])
                     msg += f"\nAvailable interactive elements: {suggestions_text}"
                 return msg
 
-            tag = getattr(elem, "tag_name", "unknown")
-            text_content = getattr(elem, "text", "") or ""
-
-            # get additional useful info
-            safe_sel = self.escape_js_string(selector)
-            extra_info = await self.run_js(f'''
-                (function() {{
-                    const el = document.querySelector("{safe_sel}");
-                    if (!el) return {{}};
-                    const style = window.getComputedStyle(el);
-                    return {{
-                        visible: style.display !== "none" && style.visibility !== "hidden",
-                        editable: el.isContentEditable || el.tagName === "INPUT" || el.tagName === "TEXTAREA",
-                        clickable: el.tagName === "BUTTON" || el.tagName === "A" || el.onclick !== null
-                    }};
-                }})()
-            ''')
-
-            visibility = "visible" if extra_info.get('visible', True) else "HIDDEN"
-            return f"Found <{tag}> ({visibility}): {text_content[:200] if text_content else '(no text)'}"
+            tag = info.get('tag', 'unknown')
+            text_content = info.get('text', '')
+            visibility = "visible" if info.get('visible', True) else "HIDDEN"
+            return f"Found <{tag}> ({visibility}): {text_content if text_content else '(no text)'}"
 
         elif text:
             elem = await page.find(text, best_match=True)
@@ -86,18 +330,16 @@ class QueryTools(ToolBase):
 
     async def find_all_elements(self, selector: str, limit: int = 20) -> str:
         """Find all elements matching a selector."""
-        elems = await self.session.page.select_all(selector)
-        if not elems:
+        found = await self.call_js(_FIND_ALL_ELEMENTS_JS, selector, limit) or {}
+        total = found.get('total', 0)
+        if not total:
             return f"No elements found: {selector}"
 
-        results = []
-        for i, elem in enumerate(elems[:limit]):
-            tag = getattr(elem, "tag_name", "unknown")
-            text = (getattr(elem, "text", "") or "")[:50]
-            results.append(f"{i+1}. <{tag}> {text}")
-
-        total, shown = len(elems), min(len(elems), limit)
-        return f"Found {total} element(s) (showing {shown}):\n" + "\n".join(results)
+        results = [
+            f"{i+1}. <{item['tag']}> {item['text']}"
+            for i, item in enumerate(found.get('items', []))
+        ]
+        return f"Found {total} element(s) (showing {len(results)}):\n" + "\n".join(results)
 
     async def get_element_text(self, selector: str) -> str:
         """Get the text content of an element."""
@@ -120,155 +362,7 @@ class QueryTools(ToolBase):
         """
         safe_filter = self.escape_js_string(filter_text) if filter_text else ""
 
-        buttons = await self.run_js(f'''
-            (function() {{
-                const filter = "{safe_filter}".toLowerCase();
-                const results = [];
-
-                // helper to get button description
-                function getDescription(el) {{
-                    // check text content
-                    const text = el.innerText?.trim();
-                    if (text) return text;
-
-                    // check aria-label
-                    const ariaLabel = el.getAttribute("aria-label");
-                    if (ariaLabel) return ariaLabel;
-
-                    // check title
-                    const title = el.getAttribute("title");
-                    if (title) return title;
-
-                    // check for icon (svg, img, i tag)
-                    const svg = el.querySelector("svg");
-                    if (svg) {{
-                        const svgTitle = svg.querySelector("title")?.textContent;
-                        if (svgTitle) return "Icon: " + svgTitle;
-                        const use = svg.querySelector("use");
-                        if (use) {{
-                            const href = use.getAttribute("href") || use.getAttribute("xlink:href");
-                            if (href) return "Icon: " + href.split("#").pop();
-                        }}
-                        return "Icon button";
-                    }}
-
-                    const img = el.querySelector("img");
-                    if (img) return "Image: " + (img.alt || img.src.split("/").pop());
-
-                    const icon = el.querySelector("i, span[class*='icon']");
-                    if (icon) return "Icon: " + (icon.className || "unknown");
-
-                    return "(no description)";
-                }}
-
-                // helper to escape CSS selector special characters
-                function escapeCSS(str) {{
-                    return str.replace(/([!"#$%&'()*+,./:;<=>?@[\\]^`{{|}}~])/g, '\\\\$1');
-                }}
-
-                // helper to check if class is valid for CSS selector
-                function isValidClass(c) {{
-                    // skip Tailwind responsive/state prefixes and complex classes
-                    if (c.includes(':') || c.includes('[') || c.includes(']') || c.includes('/')) return false;
-                    if (c.includes('hover') || c.includes('active') || c.includes('focus') || c.includes('visible')) return false;
-                    // skip classes with special CSS chars that would need escaping
-                    if (/[!"#$%&'()*+,./:;<=>?@\\^`{{|}}~]/.test(c)) return false;
-                    // skip very short generic classes or very long ones
-                    if (c.length < 2 || c.length > 30) return false;
-                    // must start with a letter or hyphen
-                    if (!/^[a-zA-Z_-]/.test(c)) return false;
-                    return true;
-                }}
-
-                // helper to get unique selector
-                function getSelector(el) {{
-                    // prefer ID
-                    if (el.id) return "#" + escapeCSS(el.id);
-
-                    // prefer name attribute
-                    if (el.name) return el.tagName.toLowerCase() + "[name='" + el.name + "']";
-
-                    // try aria-label
-                    const ariaLabel = el.getAttribute("aria-label");
-                    if (ariaLabel && ariaLabel.length < 50) {{
-                        const sel = el.tagName.toLowerCase() + "[aria-label='" + ariaLabel.replace(/'/g, "\\'") + "']";
-                        try {{
-                            if (document.querySelectorAll(sel).length === 1) return sel;
-                        }} catch(e) {{}}
-                    }}
-
-                    // try data-testid or data-id
-                    const testId = el.getAttribute("data-testid") || el.getAttribute("data-id");
-                    if (testId) {{
-                        return el.tagName.toLowerCase() + "[data-testid='" + testId + "']";
-                    }}
-
-                    // try simple classes only (no Tailwind prefixes)
-                    const classes = Array.from(el.classList).filter(isValidClass);
-                    if (classes.length > 0) {{
-                        const escapedClasses = classes.slice(0, 2).map(escapeCSS).join(".");
-                        const sel = el.tagName.toLowerCase() + "." + escapedClasses;
-                        try {{
-                            if (document.querySelectorAll(sel).length === 1) return sel;
-                        }} catch(e) {{}}
-                    }}
-
-                    // fallback: use data attributes
-                    for (const attr of el.attributes) {{
-                        if (attr.name.startsWith("data-") && attr.value && attr.value.length < 50) {{
-                            const sel = el.tagName.toLowerCase() + "[" + attr.name + "='" + attr.value.replace(/'/g, "\\'") + "']";
-                            try {{
-                                if (document.querySelectorAll(sel).length === 1) return sel;
-                            }} catch(e) {{}}
-                        }}
-                    }}
-
-                    // last resort: nth-of-type
-                    const parent = el.parentElement;
-                    if (parent) {{
-                        const siblings = Array.from(parent.children).filter(c => c.tagName === el.tagName);
-                        const index = siblings.indexOf(el) + 1;
-                        return el.tagName.toLowerCase() + ":nth-of-type(" + index + ")";
-                    }}
-
-                    return el.tagName.toLowerCase();
-                }}
-
-                // find all button-like elements
-                const selectors = [
-                    "button",
-                    "input[type='submit']",
-                    "input[type='button']",
-                    "[role='button']",
-                    "a[href='#']",
-                    "a[href='javascript:']",
-                    "[onclick]"
-                ];
-
-                const seen = new Set();
-                for (const sel of selectors) {{
-                    for (const el of document.querySelectorAll(sel)) {{
-                        if (seen.has(el)) continue;
-                        seen.add(el);
-
-                        const style = window.getComputedStyle(el);
-                        if (style.display === "none" || style.visibility === "hidden") continue;
-
-                        const desc = getDescription(el);
-                        if (filter && !desc.toLowerCase().includes(filter)) continue;
-
-                        results.push({{
-                            selector: getSelector(el),
-                            tag: el.tagName,
-                            description: desc.substring(0, 50),
-                            type: el.type || el.getAttribute("role") || "button"
-                        }});
-                    }}
-                }}
-
-                return results.slice(0, 20);
-            }})()
-        ''')
+        buttons = await self.run_js(_FIND_BUTTONS_JS_TMPL.replace("{FILTER}", safe_filter))
 
         if not buttons:
             return "No buttons found" + (f" matching '{filter_text}'" if filter_text else "")
@@ -287,62 +381,7 @@ class QueryTools(ToolBase):
         """
         safe_filter = self.escape_js_string(filter_type) if filter_type else ""
 
-        inputs = await self.run_js(f'''
-            (function() {{
-                const filter = "{safe_filter}".toLowerCase();
-                const results = [];
-
-                function getSelector(el) {{
-                    if (el.id) return "#" + el.id;
-                    if (el.name) return el.tagName.toLowerCase() + "[name='" + el.name + "']";
-                    if (el.placeholder) return el.tagName.toLowerCase() + "[placeholder='" + el.placeholder.substring(0, 30) + "']";
-
-                    const classes = Array.from(el.classList || []).filter(c => c.length < 30);
-                    if (classes.length > 0) return el.tagName.toLowerCase() + "." + classes[0];
-
-                    return el.tagName.toLowerCase();
-                }}
-
-                function getDescription(el) {{
-                    const label = document.querySelector("label[for='" + el.id + "']");
-                    if (label) return label.textContent.trim();
-                    if (el.placeholder) return el.placeholder;
-                    if (el.ariaLabel) return el.ariaLabel;
-                    return el.name || el.type || "input";
-                }}
-
-                // standard inputs
-                for (const el of document.querySelectorAll("input, textarea")) {{
-                    const style = window.getComputedStyle(el);
-                    if (style.display === "none" || el.type === "hidden") continue;
-
-                    const inputType = el.type || "text";
-                    if (filter && !inputType.includes(filter)) continue;
-
-                    results.push({{
-                        selector: getSelector(el),
-                        type: inputType,
-                        description: getDescription(el).substring(0, 40)
-                    }});
-                }}
-
-                // contenteditable and role=textbox
-                for (const el of document.querySelectorAll('[contenteditable="true"], [role="textbox"]')) {{
-                    const style = window.getComputedStyle(el);
-                    if (style.display === "none") continue;
-
-                    if (filter && !["text", "contenteditable", "textbox"].some(t => t.includes(filter))) continue;
-
-                    results.push({{
-                        selector: getSelector(el),
-                        type: el.getAttribute("role") || "contenteditable",
-                        description: el.ariaLabel || el.placeholder || "rich text editor"
-                    }});
-                }}
-
-                return results.slice(0, 20);
-            }})()
-        ''')
+        inputs = await self.run_js(_FIND_INPUTS_JS_TMPL.replace("{FILTER}", safe_filter))
 
         if not inputs:
             return "No input fields found" + (f" of type '{filter_type}'" if filter_type else "")
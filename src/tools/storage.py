@@ -1,8 +1,21 @@
 # storage tools - cookies and localStorage management
-from typing import Optional
+import json
+from typing import Dict, List, Optional
+
+from zendriver import cdp
 
 from src.tools.base import ToolBase
 
+# applies a batch of storage changes in one page round-trip, clears run before writes
+_BULK_STORAGE_JS = """(ops) => {
+    if (ops.clearLocal) localStorage.clear();
+    if (ops.clearSession) sessionStorage.clear();
+    for (const [key, value] of Object.entries(ops.localStorage)) localStorage.setItem(key, value);
+}"""
+
+# reads only the requested localStorage keys, missing ones come back as null
+_GET_STORAGE_ITEMS_JS = """(keys) => JSON.stringify(Object.fromEntries(keys.map(k => [k, localStorage.getItem(k)])))"""
+
 
 class StorageTools(ToolBase):
     """tools for cookies and browser storage"""
@@ -14,35 +27,96 @@ class StorageTools(ToolBase):
         self._mcp.tool()(self.get_local_storage)
         self._mcp.tool()(self.set_local_storage)
         self._mcp.tool()(self.clear_storage)
+        self._mcp.tool()(self.bulk_storage)
 
     async def get_cookies(self) -> str:
         """Get all cookies for the current page."""
-        cookies = await self.run_js('document.cookie')
-        return cookies if cookies else "(no cookies)"
+        page = self.session.page
+        # read from the browser's cookie store, which also covers HttpOnly cookies
+        cookies = await page.send(cdp.network.get_cookies(urls=[page.url]))
+        return "; ".join(f"{c.name}={c.value}" for c in cookies) or "(no cookies)"
 
     async def set_cookie(self, name: str, value: str, domain: Optional[str] = None) -> str:
         """Set a cookie."""
-        safe_name = self.escape_js_string(name)
-        safe_value = self.escape_js_string(value)
-        cookie_str = f"{safe_name}={safe_value}"
-        if domain:
-            cookie_str += f"; domain={self.escape_js_string(domain)}"
-        await self.run_js(f'document.cookie = "{cookie_str}"')
+        await self._apply_storage(cookies=[self._cookie_param(name, value, domain)])
         return f"Cookie set: {name}={value}"
 
-    async def get_local_storage(self) -> str:
-        """Get all localStorage items."""
-        storage = await self.run_js('JSON.stringify(localStorage)')
+    async def get_local_storage(self, keys: Optional[List[str]] = None) -> str:
+        """Get localStorage items.
+
+        Args:
+            keys: Optional list of keys to read. Defaults to every item, which can be large on SPAs.
+        """
+        if keys:
+            # only the requested items are serialized and sent back
+            storage = await self.call_js(_GET_STORAGE_ITEMS_JS, keys)
+        else:
+            storage = await self.run_js('JSON.stringify(localStorage)')
         return storage if storage else "{}"
 
     async def set_local_storage(self, key: str, value: str) -> str:
         """Set a localStorage item."""
-        safe_key = self.escape_js_string(key)
-        safe_value = self.escape_js_string(value)
-        await self.run_js(f'localStorage.setItem("{safe_key}", "{safe_value}")')
+        await self._apply_storage(local_storage={key: value})
         return f"localStorage set: {key}"
 
     async def clear_storage(self) -> str:
         """Clear localStorage and sessionStorage."""
-        await self.run_js('localStorage.clear(); sessionStorage.clear()')
+        await self._apply_storage(clear_local=True, clear_session=True)
         return "Cleared localStorage and sessionStorage"
+
+    async def bulk_storage(
+        self,
+        cookies: Optional[str] = None,
+        local_storage: Optional[str] = None,
+        clear_session: bool = False,
+        clear_local: bool = False
+    ) -> str:
+        """Set up cookies and storage in a single call.
+
+        Args:
+            cookies: JSON list like '[{"name": "session", "value": "abc", "domain": ".example.com"}]'
+            local_storage: JSON object like '{"theme": "dark"}'
+            clear_session: Clear sessionStorage first
+            clear_local: Clear localStorage first (before the new items are written)
+        """
+        cookie_list = json.loads(cookies) if cookies else []
+        items = json.loads(local_storage) if local_storage else {}
+        await self._apply_storage(
+            cookies=[self._cookie_param(c["name"], str(c["value"]), c.get("domain")) for c in cookie_list],
+            local_storage={key: str(value) for key, value in items.items()},
+            clear_session=clear_session,
+            clear_local=clear_local,
+        )
+
+        done = []
+        if clear_local:
+            done.append("cleared localStorage")
+        if clear_session:
+            done.append("cleared sessionStorage")
+        if cookie_list:
+            done.append(f"set {len(cookie_list)} cookie(s)")
+        if items:
+            done.append(f"set {len(items)} localStorage item(s)")
+        return "Storage updated: " + ", ".join(done) if done else "Nothing to do"
+
+    def _cookie_param(self, name: str, value: str, domain: Optional[str] = None) -> cdp.network.CookieParam:
+        """build a cookie scoped to the current page, like a document.cookie assignment would be"""
+        return cdp.network.CookieParam(name=name, value=value, url=self.session.page.url, domain=domain or None)
+
+    async def _apply_storage(
+        self,
+        cookies: Optional[List[cdp.network.CookieParam]] = None,
+        local_storage: Optional[Dict[str, str]] = None,
+        clear_session: bool = False,
+        clear_local: bool = False
+    ) -> None:
+        """apply cookie and storage changes with at most one cdp call and one page evaluation"""
+        if cookies:
+            # cookies go straight to the browser's cookie store, no script or escaping involved
+            await self.session.page.send(cdp.network.set_cookies(cookies))
+        if local_storage or clear_session or clear_local:
+            await self.call_js(_BULK_STORAGE_JS, {
+                "localStorage": local_storage or {},
+                "clearSession": clear_session,
+                "clearLocal": clear_local,
+            })
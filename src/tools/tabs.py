@@ -25,10 +25,8 @@ class TabTools(ToolBase):
         tabs = self.session.get_all_tabs()
         if not tabs:
             return "No tabs open"
-        lines = [f"Open tabs ({len(tabs)}):"]
-        for tab_id, url in tabs.items():
-            lines.append(f"  - {tab_id}: {url}")
-        return "\n".join(lines)
+        header = f"Open tabs ({len(tabs)}):\n"
+        return header + "\n".join(f"  - {tab_id}: {url}" for tab_id, url in tabs.items())
 
     async def switch_tab(self, tab_id: str) -> str:
         """Switch to a specific tab."""
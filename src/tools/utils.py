@@ -1,16 +1,193 @@
 # utility tools - screenshot, js execution, waiting, security audit
+import asyncio
+import base64
 import io
 import json
 import os
-import tempfile
+import re
+from collections import Counter
 from datetime import datetime
 from typing import Optional
 
 from mcp.server.fastmcp.utilities.types import Image
 from PIL import Image as PILImage
+from zendriver import cdp
+from zendriver.core.connection import ProtocolException
 
 from src.tools.base import ToolBase
 
+# page scripts for wait_for_element, passed the selector as an argument so no per-call escaping is needed
+_WAIT_FOR_ELEMENT_JS = """(sel, visible, timeoutMs) => new Promise(resolve => {
+    let observer = null, fallback = null, timer = null;
+    const finish = result => {
+        if (observer) observer.disconnect();
+        clearInterval(fallback);
+        clearTimeout(timer);
+        resolve(result);
+    };
+    const check = () => {
+        let el;
+        try {
+            el = document.querySelector(sel);
+        } catch (e) {
+            finish("invalid");
+            return true;
+        }
+        if (!el) return false;
+        if (visible) {
+            const style = window.getComputedStyle(el);
+            if (style.display === "none" || style.visibility === "hidden" || style.opacity === "0") return false;
+        }
+        finish(true);
+        return true;
+    };
+    if (check()) return;
+    observer = new MutationObserver(check);
+    observer.observe(document, { subtree: true, childList: true, attributes: true });
+    // stylesheet and animation changes don't show up as mutations, so re-check occasionally too
+    fallback = setInterval(check, 500);
+    timer = setTimeout(() => finish(false), timeoutMs);
+})"""
+
+# extra seconds granted to the evaluate call on top of the in-page timeout
+_WAIT_MARGIN = 2.0
+
+# cdp errors meaning the page navigated away under a running evaluation
+_CONTEXT_LOST_ERRORS = ("Execution context was destroyed", "Cannot find context with specified id")
+
+_ELEMENT_SUGGESTIONS_JS = """(sel) => {
+    const exact = document.querySelector(sel);
+    if (exact) {
+        const style = window.getComputedStyle(exact);
+        if (style.display === "none") return "Element exists but has display:none";
+        if (style.visibility === "hidden") return "Element exists but has visibility:hidden";
+    }
+    const needle = sel.toLowerCase().replace(/[#.\\[\\]]/g, "");
+    const suggestions = [];
+    for (const el of document.querySelectorAll("[id]")) {
+        if (el.id && el.id.toLowerCase().includes(needle)) {
+            suggestions.push("#" + el.id);
+            if (suggestions.length === 3) break;
+        }
+    }
+    return suggestions.length ? "Try: " + suggestions.join(", ") : null;
+}"""
+
+# all page-side checks for run_security_audit, gathered in a single evaluation
+_SECURITY_AUDIT_JS = """
+(function() {
+    // one snapshot of the scripts is shared by the mixed content, inline, sri, external and pattern checks
+    const scripts = Array.from(document.scripts);
+    const currentHost = location.hostname;
+    const getHost = url => { try { return new URL(url).hostname; } catch { return null; } };
+    // on very large pages the pattern and secret scans only cover a sample, to keep the audit bounded
+    const sampled = scripts.length > 200 || document.getElementsByTagName('*').length > 10000;
+
+    // form security
+    const forms = { count: document.forms.length, hasCSRF: false, hasInsecurePassword: false, passwordForms: 0 };
+    for (const form of document.forms) {
+        if (form.querySelector('input[name*="csrf"], input[name*="token"], input[name="_token"]')) forms.hasCSRF = true;
+        if (form.querySelector('input[type="password"]')) {
+            forms.passwordForms++;
+            if (form.method.toLowerCase() === 'get') forms.hasInsecurePassword = true;
+        }
+    }
+
+    // mixed content, only meaningful on https pages
+    let mixed = { check: false };
+    if (location.protocol === 'https:') {
+        const httpScripts = scripts.filter(s => s.src?.startsWith('http://')).length;
+        const httpStyles = Array.from(document.styleSheets).filter(s => s.href?.startsWith('http://')).length;
+        const httpImages = Array.from(document.images).filter(i => i.src?.startsWith('http://')).length;
+        mixed = { check: true, scripts: httpScripts, styles: httpStyles, images: httpImages,
+                  total: httpScripts + httpStyles + httpImages };
+    }
+
+    // inline scripts, sri and external scripts
+    let inline = 0, noIntegrity = 0, externalScripts = 0;
+    for (const s of scripts) {
+        if (!s.hasAttribute('src')) inline++;
+        if (s.src) {
+            if (!s.integrity) noIntegrity++;
+            if (getHost(s.src) !== currentHost) externalScripts++;
+        }
+    }
+    const externalIframes = Array.from(document.querySelectorAll('iframe'))
+        .filter(f => f.src && getHost(f.src) !== currentHost).length;
+
+    // dangerous js patterns
+    const source = (sampled ? scripts.slice(0, 50) : scripts).map(s => s.innerHTML).join('\\n');
+    const dangerous = {
+        eval: (source.match(/eval\\s*\\(/g) || []).length,
+        innerHTML: (source.match(/\\.innerHTML\\s*=/g) || []).length,
+        documentWrite: (source.match(/document\\.write\\s*\\(/g) || []).length
+    };
+
+    // sensitive data, one combined pattern streamed over text nodes and attribute values
+    // instead of serializing the whole document to outerHTML
+    const sensitivePattern = /(AKIA[0-9A-Z]{16})|(eyJ[a-zA-Z0-9_-]*\\.eyJ[a-zA-Z0-9_-]*\\.[a-zA-Z0-9_-]*)|(-----BEGIN (?:RSA |EC |DSA |)PRIVATE KEY-----)/g;
+    const sensitive = { awsKeys: 0, jwtTokens: 0, privateKeys: 0 };
+    const countSensitive = text => {
+        for (const m of text.matchAll(sensitivePattern)) {
+            if (m[1]) sensitive.awsKeys++;
+            else if (m[2]) sensitive.jwtTokens++;
+            else sensitive.privateKeys++;
+        }
+    };
+    // comments included, secrets left in commented-out markup are a common leak
+    const shown = NodeFilter.SHOW_ELEMENT | NodeFilter.SHOW_TEXT | NodeFilter.SHOW_COMMENT;
+    let budget = sampled ? 10000 : Infinity;
+    const scanSensitive = root => {
+        const walker = document.createTreeWalker(root, shown);
+        for (let node = walker.currentNode; node && budget-- > 0; node = walker.nextNode()) {
+            if (node.nodeType === Node.ELEMENT_NODE) {
+                for (const attr of node.attributes) countSensitive(attr.value);
+                // template content is a separate fragment the walker doesn't enter
+                if (node.tagName === 'TEMPLATE') scanSensitive(node.content);
+            } else if (node.nodeValue) {
+                countSensitive(node.nodeValue);
+            }
+        }
+    };
+    scanSensitive(document.documentElement);
+
+    return {
+        forms, mixed, inline, noIntegrity,
+        external: { scripts: externalScripts, iframes: externalIframes },
+        dangerous, sensitive, sampled
+    };
+})()
+"""
+
+
+# a leading `return` with no call in the first 20 characters, which would be a SyntaxError
+_BARE_RETURN_RE = re.compile(r"\s*return (?![\s\S]{0,12}\()")
+
+# shared encoder for execute_js results, non-ascii text is kept as-is
+_RESULT_ENCODER = json.JSONEncoder(indent=2, default=str, ensure_ascii=False)
+
+# base64 screenshot payloads larger than this are decoded in a worker thread
+_INLINE_DECODE_LIMIT = 512_000
+
+# save_path extensions that get a lossless copy, anything else is written as the jpeg
+_LOSSLESS_EXTENSIONS = ('.png', '.gif', '.bmp')
+
+
+def _encode_screenshot(png_b64: str, save_path: str) -> bytes:
+    """save a base64 png screenshot losslessly and compress it to jpeg for display, runs in a worker thread"""
+    png_bytes = base64.b64decode(png_b64)
+    with PILImage.open(io.BytesIO(png_bytes)) as img:
+        if save_path.lower().endswith(".png"):
+            # already a png, write it as captured rather than re-encoding
+            with open(save_path, 'wb') as f:
+                f.write(png_bytes)
+        else:
+            img.save(save_path)
+        # compress to JPEG for smaller size (under 1MB limit)
+        buffer = io.BytesIO()
+        img.convert("RGB").save(buffer, format="JPEG", quality=60, optimize=True)
+        return buffer.getvalue()
+
 
 class UtilityTools(ToolBase):
     """utility tools for screenshots, js, waiting, and security"""
@@ -31,41 +208,39 @@ class UtilityTools(ToolBase):
                       If provided, saves the file and returns the image. If not provided,
                       only returns the image data without saving to disk.
         """
-        if not self.session.page:
+        if not self.session.has_page():
             # return red placeholder image with error
             img = PILImage.new("RGB", (400, 100), color=(200, 50, 50))
             buffer = io.BytesIO()
-            img.save(buffer, format="JPEG")
+            # throwaway image, skip the huffman optimization pass
+            img.save(buffer, format="JPEG", quality=60, optimize=False, progressive=False, subsampling=2)
             return Image(data=buffer.getvalue(), format="jpeg")
 
-        with tempfile.NamedTemporaryFile(suffix=".png", delete=False) as tmp:
-            tmp_path = tmp.name
+        page = self.session.page
+        ext = os.path.splitext(save_path)[1].lower() if save_path else ""
+
+        if ext in _LOSSLESS_EXTENSIONS:
+            # lossless copy requested, capture png and derive the jpeg from it
+            data = await page.send(cdp.page.capture_screenshot(format_="png"))
+            # decoding and re-encoding is CPU bound, keep it off the event loop
+            jpeg_data = await asyncio.to_thread(_encode_screenshot, data, save_path)
+            return Image(data=jpeg_data, format="jpeg")
+
+        # let the browser encode the jpeg we return, compressed for size (under 1MB limit)
+        data = await page.send(cdp.page.capture_screenshot(
+            format_="jpeg", quality=60, optimize_for_speed=True
+        ))
+        if len(data) > _INLINE_DECODE_LIMIT:
+            jpeg_data = await asyncio.to_thread(base64.b64decode, data)
+        else:
+            jpeg_data = base64.b64decode(data)
 
-        try:
-            await self.session.page.save_screenshot(tmp_path)
-            # compress to JPEG for smaller size (under 1MB limit)
-            with PILImage.open(tmp_path) as img:
-                buffer = io.BytesIO()
-                img.convert("RGB").save(buffer, format="JPEG", quality=60, optimize=True)
-                jpeg_data = buffer.getvalue()
-
-                # If save_path provided, save to disk
-                if save_path:
-                    # Determine format from extension
-                    ext = os.path.splitext(save_path)[1].lower()
-                    if ext in ['.png', '.gif', '.bmp']:
-                        # Re-open original for lossless formats
-                        with PILImage.open(tmp_path) as orig:
-                            orig.save(save_path)
-                    else:
-                        # Save as JPEG for .jpg/.jpeg or unknown
-                        with open(save_path, 'wb') as f:
-                            f.write(jpeg_data)
-
-                return Image(data=jpeg_data, format="jpeg")
-        finally:
-            if os.path.exists(tmp_path):
-                os.remove(tmp_path)
+        if save_path:
+            # Save as JPEG for .jpg/.jpeg or unknown
+            with open(save_path, 'wb') as f:
+                f.write(jpeg_data)
+
+        return Image(data=jpeg_data, format="jpeg")
 
     async def execute_js(self, script: str) -> str:
         """Execute JavaScript code on the page and return the result.
@@ -86,8 +261,7 @@ class UtilityTools(ToolBase):
             })()
         """
         # check for common mistakes
-        stripped = script.strip()
-        if stripped.startswith('return ') and '(' not in stripped[:20]:
+        if _BARE_RETURN_RE.match(script):
             return (
                 "Error: Cannot use bare 'return' statement. "
                 "Either remove 'return' (for simple expressions) or wrap in an IIFE: "
@@ -98,7 +272,7 @@ class UtilityTools(ToolBase):
             result = await self.run_js(script)
             if result is None:
                 return "(no return value)"
-            return json.dumps(result, indent=2, default=str)
+            return _RESULT_ENCODER.encode(result)
         except Exception as e:
             error_msg = str(e)
             # provide helpful error messages
@@ -122,51 +296,31 @@ class UtilityTools(ToolBase):
             timeout: Maximum time to wait in seconds (default: 30s for SPAs)
             visible: If True, also checks element is visible (not hidden)
         """
-        safe_sel = self.escape_js_string(selector)
-
-        async def check():
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        found = False
+        # the page watches for the element itself and resolves once it shows up, instead of being polled
+        while (remaining := deadline - loop.time()) > 0:
+            script = self.build_js_call(_WAIT_FOR_ELEMENT_JS, selector, visible, int(remaining * 1000))
             try:
-                # use short timeout to avoid blocking
-                elem = await self.session.page.select(selector, timeout=0.5)
-                if elem is None:
-                    return False
-                if visible:
-                    # also check visibility
-                    is_visible = await self.run_js(f'''
-                        (function() {{
-                            const el = document.querySelector("{safe_sel}");
-                            if (!el) return false;
-                            const style = window.getComputedStyle(el);
-                            return style.display !== "none" && style.visibility !== "hidden" && style.opacity !== "0";
-                        }})()
-                    ''')
-                    return is_visible
-                return True
-            except Exception:
-                return False
-
-        if await self.wait_for_condition(check, timeout):
+                found = await asyncio.wait_for(self.run_js(script, await_promise=True), remaining + _WAIT_MARGIN)
+                break
+            except asyncio.TimeoutError:
+                break
+            except ProtocolException as e:
+                # only a document replaced mid-wait (navigation) is retried, closed or detached tabs fail fast
+                if not any(reason in str(e) for reason in _CONTEXT_LOST_ERRORS):
+                    raise
+                # watch the new document
+                await asyncio.sleep(0.1)
+
+        if found == "invalid":
+            return f"Error: Invalid selector: {selector}"
+        if found is True:
             return f"Element found: {selector}"
 
         # provide helpful suggestions on timeout
-        suggestions = await self.run_js(f'''
-            (function() {{
-                const exact = document.querySelector("{safe_sel}");
-                if (exact) {{
-                    const style = window.getComputedStyle(exact);
-                    if (style.display === "none") return "Element exists but has display:none";
-                    if (style.visibility === "hidden") return "Element exists but has visibility:hidden";
-                }}
-                const all = document.querySelectorAll("*");
-                const suggestions = [];
-                for (const el of all) {{
-                    if (el.id && el.id.toLowerCase().includes("{safe_sel}".toLowerCase().replace(/[#.\\[\\]]/g, ""))) {{
-                        suggestions.push("#" + el.id);
-                    }}
-                }}
-                return suggestions.length ? "Try: " + suggestions.slice(0, 3).join(", ") : null;
-            }})()
-        ''')
+        suggestions = await self.call_js(_ELEMENT_SUGGESTIONS_JS, selector)
 
         hint = f" ({suggestions})" if suggestions else ""
         return f"Timeout: Element not found after {timeout}s: {selector}{hint}"
@@ -190,122 +344,79 @@ class UtilityTools(ToolBase):
             "=" * 60, ""
         ]
 
+        # statuses are tallied as lines are emitted, for the summary
+        counts = Counter()
+
+        def emit(status: str, message: str) -> None:
+            counts[status] += 1
+            lines.append(f"[{status}] {message}")
+
         # https check
         is_https = url.startswith('https://')
         status = "PASS" if is_https else "FAIL"
-        lines.append(f"[{status}] HTTPS: {self.bool_to_yes_no(is_https)}" + ("" if is_https else " - INSECURE"))
+        emit(status, f"HTTPS: {self.bool_to_yes_no(is_https)}" + ("" if is_https else " - INSECURE"))
 
-        # form security check
-        forms_result = await self.run_js('''
-            (function() {
-                const forms = document.forms;
-                let hasCSRF = false, hasInsecurePassword = false, formCount = forms.length;
-                let passwordForms = 0;
-                for (let form of forms) {
-                    if (form.querySelector('input[name*="csrf"], input[name*="token"], input[name="_token"]')) hasCSRF = true;
-                    if (form.querySelector('input[type="password"]')) {
-                        passwordForms++;
-                        if (form.method.toLowerCase() === 'get') hasInsecurePassword = true;
-                    }
-                }
-                return { count: formCount, hasCSRF, hasInsecurePassword, passwordForms };
-            })()
-        ''')
+        # every page-side check runs in one round-trip
+        audit = await self.run_js(_SECURITY_AUDIT_JS)
 
+        # form security check
+        forms_result = audit['forms']
         csrf_status = "WARN" if forms_result['count'] > 0 and not forms_result['hasCSRF'] else "PASS"
-        lines.append(f"[{csrf_status}] CSRF Protection: {'Detected' if forms_result['hasCSRF'] else 'Not detected'}")
+        emit(csrf_status, f"CSRF Protection: {'Detected' if forms_result['hasCSRF'] else 'Not detected'}")
 
         pwd_status = "FAIL" if forms_result['hasInsecurePassword'] else "PASS"
-        lines.append(f"[{pwd_status}] Password Security: {'INSECURE - GET method' if forms_result['hasInsecurePassword'] else 'OK'}")
-        lines.append(f"[INFO] Forms: {forms_result['count']} total, {forms_result['passwordForms']} with passwords")
+        emit(pwd_status, f"Password Security: {'INSECURE - GET method' if forms_result['hasInsecurePassword'] else 'OK'}")
+        emit("INFO", f"Forms: {forms_result['count']} total, {forms_result['passwordForms']} with passwords")
 
         # mixed content check
-        mixed = await self.run_js('''
-            (function() {
-                if (location.protocol !== 'https:') return { check: false };
-                const httpScripts = Array.from(document.scripts).filter(s => s.src?.startsWith('http://')).length;
-                const httpStyles = Array.from(document.styleSheets).filter(s => s.href?.startsWith('http://')).length;
-                const httpImages = Array.from(document.images).filter(i => i.src?.startsWith('http://')).length;
-                return { check: true, scripts: httpScripts, styles: httpStyles, images: httpImages,
-                         total: httpScripts + httpStyles + httpImages };
-            })()
-        ''')
-
+        mixed = audit['mixed']
         if mixed['check']:
             mixed_status = "FAIL" if mixed['total'] > 0 else "PASS"
             if mixed['total'] > 0:
-                lines.append(f"[{mixed_status}] Mixed Content: {mixed['scripts']} scripts, {mixed['styles']} styles, {mixed['images']} images over HTTP")
+                emit(mixed_status, f"Mixed Content: {mixed['scripts']} scripts, {mixed['styles']} styles, {mixed['images']} images over HTTP")
             else:
-                lines.append(f"[{mixed_status}] Mixed Content: None")
+                emit(mixed_status, "Mixed Content: None")
 
         # inline scripts check
-        inline = await self.run_js('document.querySelectorAll("script:not([src])").length')
+        inline = audit['inline']
         inline_status = "INFO" if inline > 5 else "PASS"
-        lines.append(f"[{inline_status}] Inline Scripts: {inline}")
+        emit(inline_status, f"Inline Scripts: {inline}")
 
         # sri check
-        no_integrity = await self.run_js('Array.from(document.scripts).filter(s => s.src && !s.integrity).length')
+        no_integrity = audit['noIntegrity']
         sri_status = "WARN" if no_integrity > 0 else "PASS"
-        lines.append(f"[{sri_status}] Scripts without SRI: {no_integrity}")
+        emit(sri_status, f"Scripts without SRI: {no_integrity}")
 
         # external resources
-        external = await self.run_js('''
-            (function() {
-                const currentHost = location.hostname;
-                const getHost = url => { try { return new URL(url).hostname; } catch { return null; } };
-                const scripts = Array.from(document.scripts).filter(s => s.src && getHost(s.src) !== currentHost).length;
-                const iframes = Array.from(document.querySelectorAll('iframe')).filter(f => f.src && getHost(f.src) !== currentHost).length;
-                return { scripts, iframes };
-            })()
-        ''')
+        external = audit['external']
         ext_status = "INFO" if external['scripts'] > 0 else "PASS"
-        lines.append(f"[{ext_status}] External Scripts: {external['scripts']}, External Iframes: {external['iframes']}")
+        emit(ext_status, f"External Scripts: {external['scripts']}, External Iframes: {external['iframes']}")
 
-        # dangerous js patterns
-        dangerous = await self.run_js('''
-            (function() {
-                const scripts = Array.from(document.scripts).map(s => s.innerHTML).join('\\n');
-                return {
-                    eval: (scripts.match(/eval\\s*\\(/g) || []).length,
-                    innerHTML: (scripts.match(/\\.innerHTML\\s*=/g) || []).length,
-                    documentWrite: (scripts.match(/document\\.write\\s*\\(/g) || []).length
-                };
-            })()
-        ''')
+        if audit['sampled']:
+            emit("INFO", "Skipped full scan (large DOM), JS patterns and secrets were checked on a sample")
 
+        # dangerous js patterns
+        dangerous = audit['dangerous']
         dangerous_total = dangerous['eval'] + dangerous['innerHTML'] + dangerous['documentWrite']
         js_status = "WARN" if dangerous_total > 0 else "PASS"
         if dangerous_total > 0:
-            lines.append(f"[{js_status}] Dangerous JS Patterns: eval({dangerous['eval']}), innerHTML({dangerous['innerHTML']}), document.write({dangerous['documentWrite']})")
+            emit(js_status, f"Dangerous JS Patterns: eval({dangerous['eval']}), innerHTML({dangerous['innerHTML']}), document.write({dangerous['documentWrite']})")
         else:
-            lines.append(f"[{js_status}] Dangerous JS Patterns: None detected")
+            emit(js_status, "Dangerous JS Patterns: None detected")
 
         # sensitive data scan
-        sensitive = await self.run_js('''
-            (function() {
-                const html = document.documentElement.outerHTML;
-                return {
-                    awsKeys: (html.match(/AKIA[0-9A-Z]{16}/g) || []).length,
-                    jwtTokens: (html.match(/eyJ[a-zA-Z0-9_-]*\\.eyJ[a-zA-Z0-9_-]*\\.[a-zA-Z0-9_-]*/g) || []).length,
-                    privateKeys: (html.match(/-----BEGIN (RSA |EC |DSA |)PRIVATE KEY-----/g) || []).length
-                };
-            })()
-        ''')
-
+        sensitive = audit['sensitive']
         sensitive_total = sensitive['awsKeys'] + sensitive['jwtTokens'] + sensitive['privateKeys']
         sens_status = "FAIL" if sensitive_total > 0 else "PASS"
         if sensitive_total > 0:
-            lines.append(f"[{sens_status}] Exposed Secrets: AWS keys({sensitive['awsKeys']}), JWT tokens({sensitive['jwtTokens']}), Private keys({sensitive['privateKeys']})")
+            emit(sens_status, f"Exposed Secrets: AWS keys({sensitive['awsKeys']}), JWT tokens({sensitive['jwtTokens']}), Private keys({sensitive['privateKeys']})")
         else:
-            lines.append(f"[{sens_status}] Exposed Secrets: None detected")
+            emit(sens_status, "Exposed Secrets: None detected")
 
         lines.extend(["", "=" * 60])
 
         # summary
-        checks = lines[7:]
-        fails = sum(1 for line in checks if line.startswith('[FAIL]'))
-        warns = sum(1 for line in checks if line.startswith('[WARN]'))
-        passes = sum(1 for line in checks if line.startswith('[PASS]'))
+        fails, warns, passes = counts["FAIL"], counts["WARN"], counts["PASS"]
 
         if fails > 0:
             lines.append(f"RESULT: {fails} CRITICAL, {warns} WARNINGS, {passes} PASSED")